@@ -3,16 +3,39 @@ Aplicação Flask para manter o serviço no Render ativo
 e executar o bot do Telegram em background
 """
 import os
+import io
+import hmac
+import marshal
+import sys
+import time
 import asyncio
+import cProfile
+import concurrent.futures
 import threading
+import tracemalloc
+from collections import Counter
 import requests
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, abort, send_file
 
 app = Flask(__name__)
 
 # Variável para controlar se o bot já está rodando
 bot_running = False
 
+# Thread e event loop do bot (usados pelos endpoints de diagnóstico)
+bot_thread = None
+bot_loop = None
+
+# Token dos endpoints /admin; sem ele os endpoints respondem 404
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+# O profile bloqueia o worker: janela + esperas de 5s do loop ficam abaixo
+# do timeout padrão de 30s do worker sync do gunicorn (que também roda o bot)
+MAX_PROFILE_SECONDS = 15
+
+# Apenas um profile por vez; snapshot anterior do tracemalloc para diffs
+profile_lock = threading.Lock()
+last_snapshot = None
+
 # URL da API original
 ORIGINAL_API_URL = "https://aplicacaohack.com/api_bacbo.php"
 
@@ -47,14 +70,175 @@ def api_proxy():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def require_admin():
+    """Valida o token de admin; endpoints ficam ocultos se não configurado"""
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        abort(404)
+
+def bot_loop_or_503():
+    """Retorna o event loop do bot ou aborta se ele não estiver rodando"""
+    if bot_loop is None or not bot_loop.is_running():
+        abort(503, 'bot não está rodando')
+    return bot_loop
+
+def profile_seconds():
+    seconds = request.args.get('seconds', 10, type=float)
+    return max(0.1, min(seconds, MAX_PROFILE_SECONDS))
+
+def sample_collapsed(thread_id, seconds, interval):
+    """Amostra a pilha da thread do bot e agrega no formato collapsed-stack"""
+    samples = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        if stack:
+            samples[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+    return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+def profile_pstats(loop, seconds):
+    """Ativa o cProfile dentro da thread do bot por `seconds` e retorna o dump pstats"""
+    profiler = cProfile.Profile()
+    enabled = threading.Event()
+    disabled = threading.Event()
+
+    def enable():
+        profiler.enable()
+        enabled.set()
+
+    def disable():
+        profiler.disable()
+        disabled.set()
+
+    loop.call_soon_threadsafe(enable)
+    try:
+        if not enabled.wait(timeout=5):
+            abort(503, 'event loop do bot não respondeu')
+        time.sleep(seconds)
+    finally:
+        # callbacks rodam em ordem: o disable sempre roda depois do enable agendado
+        loop.call_soon_threadsafe(disable)
+    if not disabled.wait(timeout=5):
+        abort(503, 'event loop do bot não respondeu')
+    # mesmo formato de Profile.dump_stats, sem passar por arquivo temporário
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+def describe_tasks(loop):
+    tasks = []
+    for task in asyncio.all_tasks(loop):
+        buf = io.StringIO()
+        task.print_stack(file=buf)
+        tasks.append({'name': task.get_name(), 'done': task.done(), 'stack': buf.getvalue()})
+    return tasks
+
+async def _collect_tasks(loop):
+    return describe_tasks(loop)
+
+@app.route('/admin/profile')
+def admin_profile():
+    """Profile temporário da thread do bot (format=collapsed|pstats)"""
+    require_admin()
+    loop = bot_loop_or_503()
+    seconds = profile_seconds()
+    fmt = request.args.get('format', 'collapsed')
+    if fmt not in ('collapsed', 'pstats'):
+        return jsonify({'status': 'error', 'message': 'format deve ser collapsed ou pstats'}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'profile já em andamento'}), 409
+    try:
+        if fmt == 'pstats':
+            data = profile_pstats(loop, seconds)
+            return send_file(io.BytesIO(data), mimetype='application/octet-stream',
+                             as_attachment=True, download_name='bot.pstats')
+        interval = request.args.get('interval', 0.01, type=float)
+        text = sample_collapsed(bot_thread.ident, seconds, max(0.001, interval))
+        return send_file(io.BytesIO(text.encode('utf-8')), mimetype='text/plain',
+                         as_attachment=True, download_name='bot.collapsed')
+    finally:
+        profile_lock.release()
+
+@app.route('/admin/tracemalloc/start', methods=['POST'])
+def admin_tracemalloc_start():
+    """Liga o tracemalloc (custo só enquanto ligado)"""
+    global last_snapshot
+    require_admin()
+    frames = request.args.get('frames', 10, type=int)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, frames))
+    last_snapshot = None
+    return jsonify({'status': 'tracing', 'frames': tracemalloc.get_traceback_limit()}), 200
+
+@app.route('/admin/tracemalloc/snapshot')
+def admin_tracemalloc_snapshot():
+    """Tira um snapshot e retorna o top de alocações e o diff com o anterior"""
+    global last_snapshot
+    require_admin()
+    if not tracemalloc.is_tracing():
+        return jsonify({'status': 'error', 'message': 'tracemalloc não está ativo'}), 409
+    limit = request.args.get('limit', 25, type=int)
+    key = request.args.get('key', 'lineno')
+    if key not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'status': 'error', 'message': 'key inválida'}), 400
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    body = {
+        'current_bytes': current,
+        'peak_bytes': peak,
+        'top': [str(stat) for stat in snapshot.statistics(key)[:limit]],
+    }
+    if last_snapshot is not None:
+        body['diff'] = [str(stat) for stat in snapshot.compare_to(last_snapshot, key)[:limit]]
+    last_snapshot = snapshot
+    return jsonify(body), 200
+
+@app.route('/admin/tracemalloc/stop', methods=['POST'])
+def admin_tracemalloc_stop():
+    """Desliga o tracemalloc e descarta o snapshot guardado"""
+    global last_snapshot
+    require_admin()
+    tracemalloc.stop()
+    last_snapshot = None
+    return jsonify({'status': 'stopped'}), 200
+
+@app.route('/admin/tasks')
+def admin_tasks():
+    """Lista as tasks asyncio do bot com a pilha atual de cada uma"""
+    require_admin()
+    loop = bot_loop_or_503()
+    future = asyncio.run_coroutine_threadsafe(_collect_tasks(loop), loop)
+    try:
+        tasks = future.result(timeout=5)
+    except concurrent.futures.TimeoutError:
+        # loop travado: lê as tasks daqui mesmo (melhor esforço) e sinaliza com 503
+        future.cancel()
+        tasks = describe_tasks(loop)
+        return jsonify({'status': 'error', 'message': 'event loop do bot não respondeu',
+                        'count': len(tasks), 'tasks': tasks}), 503
+    return jsonify({'count': len(tasks), 'tasks': tasks}), 200
+
+async def _bot_main():
+    global bot_loop
+    import bacbo_telegram_bot
+    bot_loop = asyncio.get_running_loop()
+    await bacbo_telegram_bot.main()
+
 def run_bot():
     """Executa o bot do Telegram em background"""
     global bot_running
     try:
-        import bacbo_telegram_bot
         bot_running = True
         # Executa o bot
-        asyncio.run(bacbo_telegram_bot.main())
+        asyncio.run(_bot_main())
     except Exception as e:
         print(f"Erro ao executar bot: {e}")
         bot_running = False
@@ -62,6 +246,7 @@ def run_bot():
 # Inicia o bot em uma thread separada
 def start_bot_thread():
     """Inicia o bot em uma thread separada"""
+    global bot_thread
     bot_thread = threading.Thread(target=run_bot, daemon=True)
     bot_thread.start()
 
@@ -3,9 +3,11 @@ import json
 import logging
 import os
 import sys
+from collections import deque
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Deque, Dict, Hashable, List, Optional, Sequence
 
 # Configurar encoding UTF-8 para Windows
 if sys.platform == "win32":
@@ -32,6 +34,9 @@ BOT_TOKEN = os.getenv(
 )
 CHAT_ID = int(os.getenv("TELEGRAM_CHAT_ID", "-1003234908578"))
 POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "6"))
+ROUND_BUFFER_SIZE = int(os.getenv("ROUND_BUFFER_SIZE", "50"))
+# Quantos rounds Player/Banker recentes o detect_signal olha
+SIGNAL_WINDOW = 6
 
 # Configurar logging com mais detalhes e encoding UTF-8
 Path("logs").mkdir(exist_ok=True)
@@ -128,13 +133,99 @@ def map_result(resultado: str) -> str:
     return resultado.title()
 
 
-def detect_signal(rounds: List[Dict]) -> Optional[Dict[str, str]]:
-    filtered = [r for r in rounds if r["resultado"] in ("Player", "Banker")]
-    if len(filtered) < 3:
+class RoundBuffer:
+    """Ring buffer dos rounds recentes, mantido entre polls.
+
+    A API devolve os rounds do mais novo para o mais antigo. A cada poll só
+    os primeiros `size` itens do payload são olhados: os ainda desconhecidos
+    antes do primeiro round já guardado entram no buffer, e os já guardados
+    cujo hash ou resultado mudou são atualizados no lugar. A visão somente
+    Player/Banker acompanha. Se nenhum round do payload for conhecido (queda,
+    lacuna na API), o buffer recomeça do zero para não emendar padrões
+    através da lacuna.
+    """
+
+    def __init__(self, size: int = ROUND_BUFFER_SIZE, window: int = SIGNAL_WINDOW):
+        self.size = size
+        self.rounds: Deque[Dict] = deque()
+        self.player_banker: Deque[Dict] = deque(maxlen=window)
+        self._index: Dict[Hashable, Dict] = {}
+
+    @staticmethod
+    def _ident(item: Dict) -> Hashable:
+        if item.get("id") is not None:
+            return ("id", item["id"])
+        if item.get("hash"):
+            return ("hash", item["hash"])
+        return ("round", item.get("data_hora"), item.get("resultado"))
+
+    @property
+    def latest(self) -> Optional[Dict]:
+        return self.rounds[0] if self.rounds else None
+
+    def clear(self) -> None:
+        self.rounds.clear()
+        self.player_banker.clear()
+        self._index.clear()
+
+    def _rebuild_view(self) -> None:
+        self.player_banker.clear()
+        for round_info in self.rounds:
+            if len(self.player_banker) == self.player_banker.maxlen:
+                break
+            if round_info["resultado"] in ("Player", "Banker"):
+                self.player_banker.append(round_info)
+
+    def ingest(self, items: Sequence[Dict]) -> int:
+        """Aplica o payload e retorna quantos rounds foram inseridos ou atualizados"""
+        new_items = []
+        contiguous = False
+        updated = 0
+        for item in islice(items, self.size):
+            existing = self._index.get(self._ident(item))
+            if existing is None:
+                # Desconhecido depois de um round conhecido: mais antigo que o buffer
+                if not contiguous:
+                    new_items.append(item)
+                continue
+            contiguous = True
+            resultado = map_result(item.get("resultado", ""))
+            if existing["hash"] != item.get("hash") or existing["resultado"] != resultado:
+                existing.update(hash=item.get("hash"), data_hora=item.get("data_hora"), resultado=resultado)
+                updated += 1
+
+        if not contiguous:
+            self.clear()
+
+        # Insere do mais antigo para o mais novo, mantendo rounds[0] como o último
+        for item in reversed(new_items):
+            if len(self.rounds) >= self.size:
+                evicted = self.rounds.pop()
+                self._index.pop(self._ident(evicted), None)
+            round_info = {
+                "id": item.get("id"),
+                "hash": item.get("hash"),
+                "data_hora": item.get("data_hora"),
+                "resultado": map_result(item.get("resultado", "")),
+            }
+            self.rounds.appendleft(round_info)
+            self._index[self._ident(item)] = round_info
+            if round_info["resultado"] in ("Player", "Banker"):
+                self.player_banker.appendleft(round_info)
+        if updated:
+            self._rebuild_view()
+        return len(new_items) + updated
+
+    def sequence(self) -> List[str]:
+        return [r["resultado"] for r in self.player_banker]
+
+
+def detect_signal(recent: Sequence[Dict]) -> Optional[Dict[str, str]]:
+    """Recebe os rounds Player/Banker mais recentes (mais novo primeiro)"""
+    if len(recent) < 3:
         return None
 
-    recent = filtered[:6]
-    seq = [r["resultado"] for r in recent]
+    seq = [r["resultado"] for r in list(recent)[:SIGNAL_WINDOW]]
 
     if seq[0] == seq[1] == seq[2]:
         bet = "BANKER" if seq[0] == "Player" else "PLAYER"
@@ -169,7 +260,7 @@ def detect_signal(rounds: List[Dict]) -> Optional[Dict[str, str]]:
 
 
 async def fetch_rounds(session: aiohttp.ClientSession) -> List[Dict]:
-    """Busca rounds da API com retry automático"""
+    """Busca os itens brutos de rounds da API com retry automático"""
     max_retries = 3
     timeout = aiohttp.ClientTimeout(total=30, connect=10)
     headers = {
@@ -193,17 +284,8 @@ async def fetch_rounds(session: aiohttp.ClientSession) -> List[Dict]:
                     logger.warning("Formato inesperado da API: %s", payload)
                     return []
 
-                rounds = [
-                    {
-                        "id": item.get("id"),
-                        "hash": item.get("hash"),
-                        "data_hora": item.get("data_hora"),
-                        "resultado": map_result(item.get("resultado", "")),
-                    }
-                    for item in data
-                ]
-                logger.debug("Rounds obtidos: %d", len(rounds))
-                return rounds
+                logger.debug("Rounds obtidos: %d", len(data))
+                return data
         except asyncio.TimeoutError:
             logger.warning("Timeout ao buscar rounds da API (tentativa %d/%d)", attempt + 1, max_retries)
             if attempt < max_retries - 1:
@@ -278,6 +360,7 @@ async def run_bot() -> None:
     logger.info("Intervalo de polling: %d segundos", POLL_INTERVAL_SECONDS)
     logger.info("=" * 50)
 
+    buffer = RoundBuffer()
     last_hash = None
     waiting_result = False
     signal_bet = None
@@ -287,8 +370,8 @@ async def run_bot() -> None:
     async with aiohttp.ClientSession() as session:
         while True:
             try:
-                rounds = await fetch_rounds(session)
-                if not rounds:
+                items = await fetch_rounds(session)
+                if not items:
                     logger.debug("Nenhum round recebido, aguardando...")
                     await asyncio.sleep(POLL_INTERVAL_SECONDS)
                     continue
@@ -296,7 +379,9 @@ async def run_bot() -> None:
                 # Resetar contador de erros em caso de sucesso
                 error_count = 0
 
-                latest = rounds[0]
+                added = buffer.ingest(items)
+                logger.debug("Rounds novos: %d", added)
+                latest = buffer.latest
                 current_hash = latest.get("hash")
 
                 # Verificar resultado da última aposta
@@ -356,7 +441,7 @@ async def run_bot() -> None:
 
                 # Detectar novo sinal
                 if not waiting_result and current_hash and current_hash != last_hash:
-                    signal = detect_signal(rounds)
+                    signal = detect_signal(buffer.player_banker)
                     if signal:
                         logger.info("🎯 Novo sinal detectado: %s (%s)", signal["bet"], signal["pattern"])
                         stats.register_signal(signal["bet"])
@@ -366,10 +451,7 @@ async def run_bot() -> None:
                         signal_bet = signal["bet"]
                     else:
                         # Log para debug: mostrar os últimos rounds
-                        filtered = [r for r in rounds if r["resultado"] in ("Player", "Banker")]
-                        recent = filtered[:6]
-                        seq = [r["resultado"] for r in recent]
-                        logger.info("📊 Sem sinal. Sequência atual: %s", seq)
+                        logger.info("📊 Sem sinal. Sequência atual: %s", buffer.sequence())
                     
                     last_hash = current_hash
 
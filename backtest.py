@@ -1,15 +1,14 @@
-import sqlite3
 import json
+import mmap
+import struct
+import sys
+from array import array
 from collections import defaultdict
-
-DB_FILE = 'sistemabacbo.db'
+import db
+from db import DB_FILE
 
 def load_history():
-    db = sqlite3.connect(DB_FILE)
-    db.row_factory = sqlite3.Row
-    cur = db.cursor()
-    cur.execute('SELECT timestamp, sequence, result_json FROM history ORDER BY id ASC')
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = [dict(r) for r in db.query('SELECT timestamp, sequence, result_json FROM history ORDER BY id ASC')]
     # parse sequences into token lists
     for r in rows:
         r['tokens'] = [t for t in r['sequence'].split() if t]
@@ -52,7 +51,98 @@ def infer_next_results(rows):
         inferred.append({'timestamp': r['timestamp'], 'sequence': r['sequence'], 'result': r.get('result', {}), 'next': next_token})
     return inferred
 
-def simulate(inferred, stake_fraction=0.01, initial_bank=1000.0, thresholds={'aggressive':0.25,'conservative':0.4}):
+# compact per-bet history: one typed array per column instead of a dict per bet
+SIDE_CODES = {'BANKER': 0, 'PLAYER': 1, 'TIE': 2}
+OUTCOME_CODES = {'B': 0, 'P': 1, 'T': 2}
+# (name, typecode) in on-disk order; 8-byte columns first keeps every column aligned
+HISTORY_COLUMNS = [('profit', 'd'), ('bank', 'd'), ('conf', 'd'), ('ts_index', 'i'), ('side', 'b'), ('outcome', 'b')]
+# on-disk width of each typecode; 'i' is a C int, so it is checked against the platform
+HISTORY_WIDTHS = {'d': 8, 'i': 4, 'b': 1}
+HISTORY_MAGIC = b'BBH1'
+HISTORY_HEADER = struct.Struct('<4sI')
+HISTORY_DATA_OFFSET = HISTORY_HEADER.size + (-HISTORY_HEADER.size % 8)
+
+def new_history():
+    # ts_index is the position of the bet's entry in the `inferred` list
+    return {name: array(code) for name, code in HISTORY_COLUMNS}
+
+def check_widths():
+    for code, width in HISTORY_WIDTHS.items():
+        if array(code).itemsize != width:
+            raise RuntimeError(f"array typecode '{code}' is {array(code).itemsize} bytes here, bet files need {width}")
+
+def save_bets(history, path):
+    # header (magic, count) followed by each column's raw bytes, always little-endian
+    check_widths()
+    count = len(history['bank'])
+    with open(path, 'wb') as f:
+        f.write(HISTORY_HEADER.pack(HISTORY_MAGIC, count))
+        f.write(b'\0' * (HISTORY_DATA_OFFSET - HISTORY_HEADER.size))
+        for name, _ in HISTORY_COLUMNS:
+            column = history[name]
+            if sys.byteorder != 'little':
+                column = array(column.typecode, column)
+                column.byteswap()
+            column.tofile(f)
+
+class BetFile:
+    # columns of a file written by save_bets; use as a context manager so the
+    # memoryviews and the mmap are released on exit
+    def __init__(self, columns, mm=None):
+        self.columns = columns
+        self._mm = mm
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+def load_bets(path):
+    # memory-maps a file written by save_bets; columns are read-only memoryviews
+    check_widths()
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, count = HISTORY_HEADER.unpack_from(mm)
+    except struct.error:
+        magic = count = None
+    if magic != HISTORY_MAGIC:
+        mm.close()
+        raise ValueError(f'{path}: not a bet history file')
+    sizes = [HISTORY_WIDTHS[code] * count for _, code in HISTORY_COLUMNS]
+    file_size = len(mm)
+    if file_size < HISTORY_DATA_OFFSET + sum(sizes):
+        mm.close()
+        raise ValueError(f'{path}: truncated bet history file ({file_size} bytes for {count} bets)')
+    columns = {}
+    offset = HISTORY_DATA_OFFSET
+    if sys.byteorder != 'little':
+        # big-endian hosts cannot view the file in place; fall back to swapped copies
+        for (name, code), size in zip(HISTORY_COLUMNS, sizes):
+            columns[name] = array(code, mm[offset:offset + size])
+            columns[name].byteswap()
+            offset += size
+        mm.close()
+        return BetFile(columns)
+    with memoryview(mm) as view:
+        for (name, code), size in zip(HISTORY_COLUMNS, sizes):
+            columns[name] = view[offset:offset + size].cast(code)
+            offset += size
+    return BetFile(columns, mm)
+
+def simulate(inferred, stake_fraction=0.01, initial_bank=1000.0, thresholds={'aggressive':0.25,'conservative':0.4}, record_history=True):
     results = {}
     payout = {'BANKER':0.95, 'PLAYER':1.0, 'TIE':8.0}
     for mode in ['aggressive','conservative']:
@@ -62,8 +152,8 @@ def simulate(inferred, stake_fraction=0.01, initial_bank=1000.0, thresholds={'ag
         bets = 0
         wins = 0
         net = 0.0
-        history = []
-        for entry in inferred:
+        history = new_history() if record_history else None
+        for idx, entry in enumerate(inferred):
             next_out = entry['next']  # 'B'/'P'/'T' or None
             if not next_out:
                 continue
@@ -103,10 +193,18 @@ def simulate(inferred, stake_fraction=0.01, initial_bank=1000.0, thresholds={'ag
             peak = max(peak, bank)
             dd = (peak - bank)
             max_dd = max(max_dd, dd)
-            history.append({'timestamp': entry['timestamp'], 'bet': bet_side, 'next': next_out, 'profit': profit, 'bank': bank, 'conf': conf})
+            if history is not None:
+                history['ts_index'].append(idx)
+                history['side'].append(SIDE_CODES.get(bet_side, -1))
+                history['outcome'].append(OUTCOME_CODES.get(next_out, -1))
+                history['profit'].append(profit)
+                history['bank'].append(bank)
+                history['conf'].append(conf)
         roi = (bank - initial_bank) / initial_bank if initial_bank else 0.0
         win_rate = (wins / bets) if bets else 0.0
-        results[mode] = {'bets': bets, 'wins': wins, 'win_rate': round(win_rate,3), 'net': round(net,2), 'roi': round(roi,4), 'max_drawdown': round(max_dd,2), 'final_bank': round(bank,2), 'history': history}
+        results[mode] = {'bets': bets, 'wins': wins, 'win_rate': round(win_rate,3), 'net': round(net,2), 'roi': round(roi,4), 'max_drawdown': round(max_dd,2), 'final_bank': round(bank,2)}
+        if history is not None:
+            results[mode]['history'] = history
     return results
 
 def report(results):
@@ -127,5 +225,5 @@ if __name__ == '__main__':
     stakes = [0.01, 0.02, 0.05]
     for s in stakes:
         print('--- Stake fraction:', s, '---')
-        res = simulate(inferred, stake_fraction=s)
+        res = simulate(inferred, stake_fraction=s, record_history=False)
         report(res)
@@ -0,0 +1,93 @@
+"""
+Acesso compartilhado ao banco SQLite (sistemabacbo.db)
+
+Cada thread reutiliza sua própria conexão, com WAL e busy timeout, para que o
+app web, a thread do bot e as ferramentas offline possam usar o banco ao mesmo
+tempo sem "database is locked".
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_FILE = os.environ.get('BACBO_DB_FILE', 'sistemabacbo.db')
+BUSY_TIMEOUT_MS = 5000
+# sqlite3 reaproveita os statements preparados pelo texto do SQL
+STATEMENT_CACHE_SIZE = 128
+
+PRAGMAS = [
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA foreign_keys=ON',
+]
+
+# As conexões ficam no threading.local e são fechadas quando a thread termina
+_local = threading.local()
+# journal_mode=WAL é persistente no arquivo: basta aplicar uma vez por caminho
+_wal_paths = set()
+_wal_lock = threading.Lock()
+
+
+def _connect(path):
+    # isolation_level=None: leituras não abrem transação; escritas usam transaction()
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _wal_lock:
+        if path not in _wal_paths:
+            conn.execute('PRAGMA journal_mode=WAL')
+            _wal_paths.add(path)
+    return conn
+
+
+def get_connection(path=None):
+    """Retorna a conexão da thread atual para `path`, criando se necessário"""
+    path = path or DB_FILE
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+
+@contextmanager
+def read_transaction(path=None):
+    """Transação de leitura: todas as consultas dentro dela veem o mesmo snapshot"""
+    conn = get_connection(path)
+    conn.execute('BEGIN')
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+@contextmanager
+def transaction(path=None):
+    """Transação de escrita (BEGIN IMMEDIATE) com commit/rollback automático"""
+    conn = get_connection(path)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def query(sql, params=(), path=None):
+    """Executa um SELECT e retorna todas as linhas (sqlite3.Row)"""
+    return get_connection(path).execute(sql, params).fetchall()
@@ -1,30 +1,129 @@
 import csv
+import hashlib
 from itertools import product
+import db
 from backtest import load_history, infer_next_results, simulate
 
-def run_sweep(aggr_range, cons_range, stakes, initial_bank=1000.0):
-    rows = load_history()
-    inferred = infer_next_results(rows)
+MODES = ['aggressive','conservative']
+METRICS = ['bets','wins','win_rate','net','roi','final_bank','max_drawdown']
+
+# one row per (history fingerprint, parameter tuple, mode); the primary key is the lookup index
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweep_results (
+    fingerprint TEXT NOT NULL,
+    aggressive_thr REAL NOT NULL,
+    conservative_thr REAL NOT NULL,
+    stake REAL NOT NULL,
+    initial_bank REAL NOT NULL,
+    mode TEXT NOT NULL,
+    bets INTEGER,
+    wins INTEGER,
+    win_rate REAL,
+    net REAL,
+    roi REAL,
+    final_bank REAL,
+    max_drawdown REAL,
+    PRIMARY KEY (fingerprint, aggressive_thr, conservative_thr, stake, initial_bank, mode)
+)
+"""
+
+INSERT_SQL = (
+    'INSERT OR REPLACE INTO sweep_results (fingerprint, aggressive_thr, conservative_thr, stake, initial_bank, mode, '
+    + ', '.join(METRICS) + ') VALUES (' + ', '.join('?' * (6 + len(METRICS))) + ')'
+)
+SELECT_SQL = (
+    'SELECT mode, ' + ', '.join(METRICS) + ' FROM sweep_results '
+    'WHERE fingerprint = ? AND aggressive_thr = ? AND conservative_thr = ? AND stake = ? AND initial_bank = ?'
+)
+
+def ensure_schema():
+    db.get_connection().execute(SCHEMA)
+
+def history_fingerprint():
+    # max id plus a hash of every row, so edits to old rows also invalidate cached cells
+    digest = hashlib.sha256()
+    max_id = 0
+    for r in db.get_connection().execute('SELECT id, sequence, result_json FROM history ORDER BY id ASC'):
+        max_id = r['id']
+        digest.update(f"{r['id']}\x1f{r['sequence']}\x1f{r['result_json']}\x1e".encode('utf-8'))
+    return f'{max_id}:{digest.hexdigest()[:16]}'
+
+def cached_cell(fingerprint, a_thr, c_thr, stake, initial_bank):
+    rows = db.query(SELECT_SQL, (fingerprint, a_thr, c_thr, stake, initial_bank))
+    if len(rows) < len(MODES):
+        return None
+    by_mode = {r['mode']: dict(r) for r in rows}
+    return [dict(aggressive_thr=a_thr, conservative_thr=c_thr, stake=stake, mode=mode,
+                 **{k: by_mode[mode][k] for k in METRICS}) for mode in MODES]
+
+def compute_cell(inferred, a_thr, c_thr, stake, initial_bank):
+    thresholds = {'aggressive': a_thr, 'conservative': c_thr}
+    res = simulate(inferred, stake_fraction=stake, initial_bank=initial_bank, thresholds=thresholds, record_history=False)
+    # record key metrics for both modes
+    cell = []
+    for mode in MODES:
+        r = res.get(mode, {})
+        cell.append({
+            'aggressive_thr': a_thr,
+            'conservative_thr': c_thr,
+            'stake': stake,
+            'mode': mode,
+            'bets': r.get('bets',0),
+            'wins': r.get('wins',0),
+            'win_rate': r.get('win_rate',0.0),
+            'net': r.get('net',0.0),
+            'roi': r.get('roi',0.0),
+            'final_bank': r.get('final_bank',initial_bank),
+            'max_drawdown': r.get('max_drawdown',0.0)
+        })
+    return cell
+
+# fingerprints look like '<max history.id>:<hash>'
+PRUNE_SQL = (
+    "DELETE FROM sweep_results "
+    "WHERE CAST(substr(fingerprint, 1, instr(fingerprint, ':') - 1) AS INTEGER) < ?"
+)
+
+def fingerprint_max_id(fingerprint):
+    return int(fingerprint.split(':', 1)[0])
+
+def store_cell(fingerprint, initial_bank, cell, prune=False):
+    # one commit per cell so an interrupted sweep resumes from the last finished cell;
+    # with prune=True cells from histories older than this one are dropped in the same transaction
+    with db.transaction() as conn:
+        if prune:
+            conn.execute(PRUNE_SQL, (fingerprint_max_id(fingerprint),))
+        conn.executemany(INSERT_SQL, [
+            (fingerprint, r['aggressive_thr'], r['conservative_thr'], r['stake'], initial_bank, r['mode'])
+            + tuple(r[k] for k in METRICS)
+            for r in cell
+        ])
+
+def run_sweep(aggr_range, cons_range, stakes, initial_bank=1000.0, stats=None):
+    # pass a dict as `stats` to get the number of computed and cached cells back
+    ensure_schema()
+    grid = list(product(aggr_range, cons_range, stakes))
+    inferred = None
+    # fingerprint and history come from the same snapshot, so cells are never
+    # stored under a fingerprint of different data
+    with db.read_transaction():
+        fingerprint = history_fingerprint()
+        missing = [cell for cell in grid if cached_cell(fingerprint, *cell, initial_bank) is None]
+        # history is only loaded when at least one cell is missing
+        if missing:
+            inferred = infer_next_results(load_history())
+    for i, (a_thr, c_thr, stake) in enumerate(missing):
+        store_cell(fingerprint, initial_bank, compute_cell(inferred, a_thr, c_thr, stake, initial_bank), prune=(i == 0))
+    if stats is not None:
+        stats['computed'] = len(missing)
+        stats['cached'] = len(grid) - len(missing)
+    return export_results(fingerprint, grid, initial_bank)
+
+def export_results(fingerprint, grid, initial_bank=1000.0):
+    # report rows always come from the store, in grid order
     results = []
-    for a_thr, c_thr, stake in product(aggr_range, cons_range, stakes):
-        thresholds = {'aggressive': a_thr, 'conservative': c_thr}
-        res = simulate(inferred, stake_fraction=stake, initial_bank=initial_bank, thresholds=thresholds)
-        # record key metrics for both modes
-        for mode in ['aggressive','conservative']:
-            r = res.get(mode, {})
-            results.append({
-                'aggressive_thr': a_thr,
-                'conservative_thr': c_thr,
-                'stake': stake,
-                'mode': mode,
-                'bets': r.get('bets',0),
-                'wins': r.get('wins',0),
-                'win_rate': r.get('win_rate',0.0),
-                'net': r.get('net',0.0),
-                'roi': r.get('roi',0.0),
-                'final_bank': r.get('final_bank',initial_bank),
-                'max_drawdown': r.get('max_drawdown',0.0)
-            })
+    for a_thr, c_thr, stake in grid:
+        results.extend(cached_cell(fingerprint, a_thr, c_thr, stake, initial_bank) or [])
     return results
 
 def save_csv(rows, path='sweep_report.csv'):
@@ -50,7 +149,9 @@ if __name__ == '__main__':
     print('aggr:', aggr_range)
     print('cons:', cons_range)
     print('stakes:', stakes)
-    rows = run_sweep(aggr_range, cons_range, stakes)
+    stats = {}
+    rows = run_sweep(aggr_range, cons_range, stakes, stats=stats)
+    print(f"Sweep cells: {stats['computed']} computed, {stats['cached']} from cache")
     save_csv(rows)
     print('Saved sweep_report.csv')
     print_top(rows, top=10, sort_key='roi')